@@ -2,29 +2,91 @@
 # -*- coding: utf-8 -*-
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
-import hashlib
+from hashlib import md5
 import urllib.parse
 import json
+import os
 from pathlib import Path
+from functools import lru_cache
+from operator import itemgetter
 import shutil
-from functools import reduce
 import sqlite3
-import qrcode
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from dplogging import setup_logger
 logger = setup_logger(Path(__file__).stem)
 
-MIXIN_KEY_ENC_TAB = [
+MIXIN_KEY_ENC_TAB = (
     46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
     33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
     61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
     36, 20, 34, 44, 52
-]
+)
+# mixinKey 只取前32位，预先用对应的下标构造 itemgetter，一次调用即可在C层取出全部字符
+_MIXIN_GATHER = itemgetter(*MIXIN_KEY_ENC_TAB[:32])
+# WBI签名时需要从参数值中去掉的字符
+_WBI_STRIP_TABLE = str.maketrans('', '', "!'()*")
+
+# WBI密钥通常数小时才轮换一次，缓存一段时间避免每个UP主都请求一次 nav 接口
+WBI_KEYS_TTL = 30 * 60
+_WBI_CACHE = {"keys": None, "ts": 0.0}
+# 多个线程同时发现缓存失效时，只让一个线程去获取密钥，其余线程等待后直接使用其结果
+# 获取密钥时会在持有锁的情况下调用 store_wbi_keys，因此使用可重入锁
+_WBI_LOCK = threading.RLock()
+
+# 用户信息和关注分组在一次运行中基本不会变化，按session缓存，长时间运行时也只偶尔刷新
+SESSION_INFO_TTL = 60 * 60
+# 以session对象本身为键 (弱引用)，避免被回收的session的 id 被复用后串用其缓存
+_SESSION_INFO_CACHE = weakref.WeakKeyDictionary()  # {session: {名称: (时间戳, 结果)}}
+
+# B站接口地址
+QRCODE_GENERATE_API = "https://passport.bilibili.com/x/passport-login/web/qrcode/generate"
+QRCODE_POLL_API = "https://passport.bilibili.com/x/passport-login/web/qrcode/poll"
+NAV_API = "https://api.bilibili.com/x/web-interface/nav"
+RELATION_TAGS_API = "https://api.bilibili.com/x/relation/tags"
+RELATION_TAG_API = "https://api.bilibili.com/x/relation/tag"
+ARC_SEARCH_API = "https://api.bilibili.com/x/space/wbi/arc/search"
+
+# nav 接口在一次运行中会被请求多次 (登录检查、用户信息、WBI密钥)，记录其 ETag 以便使用条件请求
+# 以session对象本身为键 (弱引用)：扫码登录时被丢弃的session会自动移除，其 id 被新session复用也不会串用
+_NAV_CACHE = weakref.WeakKeyDictionary()  # {session: (etag, 解析后的响应)}
+
+# 所有请求共用的 User-Agent 和基础请求头，创建session时一次性设置，单次请求只需额外传入 Referer
+_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
+_BASE_HEADERS = {
+    "User-Agent": _UA,
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Connection": "keep-alive",
+}
+
+# 优先使用 orjson 解析/序列化 JSON，未安装时退回标准库 json
+if orjson:
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+else:
+    _loads = json.loads
+
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
 
 def get_mixin_key(orig: str):
     """根据B站的规则对imgKey和subKey进行打乱，生成mixinKey"""
-    return reduce(lambda s, i: s + orig[i], MIXIN_KEY_ENC_TAB, '')[:32]
+    return ''.join(_MIXIN_GATHER(orig))
+
+@lru_cache(maxsize=4)
+def _mixin_key_bytes(img_key: str, sub_key: str):
+    """WBI密钥很少变化，缓存编码后的mixinKey，避免每次签名都重新计算"""
+    return get_mixin_key(img_key + sub_key).encode('ascii')
 
 def parse_config_file():
     """解析配置文件，返回配置字典"""
@@ -37,8 +99,8 @@ def parse_config_file():
             exit()
 
     try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            _config = json.load(f)
+        with open(CONFIG_FILE, 'rb') as f:
+            _config = _loads(f.read())
     except (json.JSONDecodeError, Exception) as e:
         logger.error(f"读取配置文件 {CONFIG_FILE} 失败: {e}")
         logger.error(f"请检查文件格式是否正确，或删除 {CONFIG_FILE} 以从示例文件重新生成。")
@@ -52,20 +114,100 @@ CONFIG_SAMPLE_FILE = SCRIPT_DIR / "config_sample.json"
 config = parse_config_file()
 DATA_DIR = SCRIPT_DIR / config.get("data_directory", "data")
 DB_FILE = DATA_DIR / "bilibili_videos.db"
-
+DB_STR = str(DB_FILE)
+COOKIE_FILE = DATA_DIR / "bili_cookies.json"
+
+
+class RateLimiter:
+    """令牌桶限速器，多个线程共享，用于控制整体的请求频率。
+    遇到限流时自动降低速率，请求恢复正常后再逐步回升到初始速率。"""
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = None):
+        self.base_rate = rate     # 初始 (也是最高) 速率
+        self.rate = rate          # 当前每秒生成的令牌数
+        self.min_rate = min_rate if min_rate is not None else rate / 8
+        self.capacity = burst     # 桶的容量，即允许的突发请求数
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def backoff(self):
+        """被限流时调用：速率减半 (不低于 min_rate)，并清空已积攒的令牌"""
+        with self.lock:
+            self.rate = max(self.rate / 2, self.min_rate)
+            self.tokens = 0.0
+
+    def recover(self):
+        """请求成功时调用：速率逐步回升，直到初始速率"""
+        with self.lock:
+            self.rate = min(self.rate * 1.25, self.base_rate)
+
+    def acquire(self):
+        """阻塞直到获得一个令牌"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# 所有B站接口请求共用的限速器，平均每 retry_interval 秒一个请求，允许少量突发
+# retry_interval 配置为0 (不等待) 时按最小间隔限速，避免除零，也避免请求过于密集被风控
+MIN_REQUEST_INTERVAL = 0.1
+api_limiter = RateLimiter(1 / max(config.get("retry_interval", 5), MIN_REQUEST_INTERVAL), burst=3)
+
+
+def new_session(headers: dict):
+    """创建一个设置好请求头和连接池的session"""
+    session = requests.Session()
+    session.headers.update(headers)
+    # 请求几乎都发往少数几个B站域名，扩大连接池以便并发请求时复用已建立的连接
+    # 连接被重置、读取超时等瞬时网络错误在连接层直接快速重试，不必等待上层 retry_interval 的重试
+    # 只重试网络错误：429 等状态码即使带有 Retry-After 也直接返回，交给上层的限流处理 (api_limiter.backoff)
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.3, status=0, respect_retry_after_header=False),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _write_atomic(path: Path, data: bytes):
+    """先写入同目录下的临时文件再替换目标文件，避免写入中断导致文件损坏"""
+    tmp_file = path.with_name(path.name + ".tmp")
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, path)
+
+def save_cookies(cookies: dict):
+    """保存cookies到本地文件，内容未变化时跳过写入。返回是否实际写入了文件。"""
+    data = _dumps(cookies)
+    try:
+        if COOKIE_FILE.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    _write_atomic(COOKIE_FILE, data)
+    return True
 
 def login_by_qrcode():
     """通过二维码扫描进行登录并返回一个包含cookies的session对象"""
+    # 只有本地登录信息失效时才需要二维码，延迟导入以加快常规启动
+    import qrcode
+
     # 1. 获取二维码URL和key
-    login_url_api = "https://passport.bilibili.com/x/passport-login/web/qrcode/generate"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
-    }
+    # 增加 User-Agent 头，模拟浏览器访问，解决412错误；后续轮询也复用这个 session 的连接
+    session = new_session(_BASE_HEADERS)
     try:
-        # 增加 User-Agent 头，模拟浏览器访问，解决412错误
-        response = requests.get(login_url_api, headers=headers)
+        api_limiter.acquire()
+        response = session.get(QRCODE_GENERATE_API, timeout=10)
         response.raise_for_status()
-        data = response.json()['data']
+        data = _loads(response.content)['data']
         qrcode_key = data['qrcode_key']
         qr_url = data['url']
     except Exception as e:
@@ -80,85 +222,135 @@ def login_by_qrcode():
     logger.info("请使用Bilibili手机客户端扫描上方二维码")
 
     # 3. 轮询登录状态
-    poll_api = "https://passport.bilibili.com/x/passport-login/web/qrcode/poll"
-    session = requests.Session()
-    session.headers.update(headers) # 为轮询的 session 也设置 User-Agent
-    
+    # 轮询间隔：未扫码时从1秒开始逐步加倍到3秒；扫码后缩短到0.5秒以便尽快拿到确认结果
+    # 无论服务器返回多快，每次轮询之间至少等待 0.5 秒，避免退化成无间隔的死循环
+    # B站二维码有效期为180秒，超过后即使服务器没有返回失效状态也停止轮询
+    # 轮询按上面的间隔自行控制节奏，不经过 api_limiter，以免扫码确认后还要等待 retry_interval
+    poll_deadline = time.monotonic() + 180
+    poll_delay = 1.0
+    scanned = False
     try:
-        while True:
-            time.sleep(config.get("retry_interval", 5))  # 等待一段时间后再轮询
+        while time.monotonic() < poll_deadline:
+            time.sleep(max(poll_delay, 0.5))
             params = {'qrcode_key': qrcode_key}
-            poll_response = session.get(poll_api, params=params) # 此处将自动使用 session 的 headers
+            poll_response = session.get(QRCODE_POLL_API, params=params, timeout=10) # 此处将自动使用 session 的 headers
             poll_response.raise_for_status()
-            poll_data = poll_response.json()['data']
+            poll_data = _loads(poll_response.content)['data']
             
             code = poll_data['code']
             if code == 0:
                 logger.info("登录成功！")
-                with open(COOKIE_FILE, 'w') as f:
-                    json.dump(session.cookies.get_dict(), f)
-                logger.info(f"登录信息已保存到 {COOKIE_FILE}")
+                if save_cookies(session.cookies.get_dict()):
+                    logger.info(f"登录信息已保存到 {COOKIE_FILE}")
                 return session
             elif code == 86038:
                 logger.info("二维码已失效，请重新运行程序。")
                 return None
             elif code == 86090:
-                logger.info("二维码已扫描，请在手机上确认登录...")
+                if not scanned:
+                    logger.info("二维码已扫描，请在手机上确认登录...")
+                    scanned = True
+                poll_delay = 0.5
+            elif code == 86101:
+                poll_delay = min(poll_delay * 2, 3.0)
+        logger.info("等待扫码超时，请重新运行程序。")
+        return None
     except Exception as e:
         logger.info(f"轮询登录状态时发生错误: {e}")
         return None
 
-def get_wbi_keys(session: requests.Session):
-    """获取WBI签名所需的img_key和sub_key，失败时会自动重试。"""
-    url = "https://api.bilibili.com/x/web-interface/nav"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-        "Accept": "application/json, text/plain, */*",
-        "Accept-Language": "en-US,en;q=0.5",
-    }
-
-    max_retries = config.get("retry_max", 10)
-    retry_interval = config.get("retry_interval", 5)
+def _cached_nav(session: requests.Session):
+    """请求 nav 接口并返回解析后的JSON。带上次响应的 ETag 发起条件请求，返回304时直接复用上次的解析结果。
+    响应中带有的WBI密钥会顺便缓存，之后签名时无需再单独请求。"""
+    cached = _NAV_CACHE.get(session)
+    headers = {"If-None-Match": cached[0]} if cached else None
+    api_limiter.acquire()
+    response = session.get(NAV_API, headers=headers, timeout=10)
+    if response.status_code == 304 and cached:
+        data = cached[1]
+    else:
+        response.raise_for_status()
+        data = _loads(response.content)
+        etag = response.headers.get("ETag")
+        if etag:
+            _NAV_CACHE[session] = (etag, data)
+    try:
+        store_wbi_keys(data)
+    except (KeyError, TypeError):
+        pass
+    return data
+
+def store_wbi_keys(nav_data: dict):
+    """从 nav 接口的响应中解析出WBI密钥，写入内存缓存，返回 (img_key, sub_key)"""
+    img_url = nav_data["data"]["wbi_img"]["img_url"]
+    sub_url = nav_data["data"]["wbi_img"]["sub_url"]
+    img_key = img_url.split("/")[-1].split(".")[0]
+    sub_key = sub_url.split("/")[-1].split(".")[0]
+    with _WBI_LOCK:
+        _WBI_CACHE["keys"] = (img_key, sub_key)
+        _WBI_CACHE["ts"] = time.time()
+    return img_key, sub_key
+
+def invalidate_wbi_keys(keys: tuple):
+    """签名请求因密钥失效被拒绝时调用，丢弃缓存的这组密钥，下次签名时重新获取。
+    其他线程可能已经换上了新密钥，只有缓存中仍是这组密钥时才丢弃。"""
+    with _WBI_LOCK:
+        if _WBI_CACHE["keys"] != keys:
+            return
+        _WBI_CACHE["keys"] = None
+        _WBI_CACHE["ts"] = 0.0
+        # 同时丢弃 nav 接口的 ETag，确保下次拿到的是完整的新响应而不是304
+        _NAV_CACHE.clear()
+
+def _cached_wbi_keys():
+    """返回内存中未过期的WBI密钥，没有时返回None"""
+    if _WBI_CACHE["keys"] and time.time() - _WBI_CACHE["ts"] < WBI_KEYS_TTL:
+        return _WBI_CACHE["keys"]
+    return None
 
-    for attempt in range(max_retries):
-        try:
-            response = session.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            img_url = data["data"]["wbi_img"]["img_url"]
-            sub_url = data["data"]["wbi_img"]["sub_url"]
-            img_key = img_url.split("/")[-1].split(".")[0]
-            sub_key = sub_url.split("/")[-1].split(".")[0]
-            return img_key, sub_key
-        except Exception as e:
-            logger.info(f"获取WBI密钥失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                logger.info(f"将在 {retry_interval} 秒后重试...")
-                time.sleep(retry_interval)
+def get_wbi_keys(session: requests.Session):
+    """获取WBI签名所需的img_key和sub_key，失败时会自动重试。
+    结果会在内存中缓存 WBI_KEYS_TTL 秒。"""
+    keys = _cached_wbi_keys()
+    if keys:
+        return keys
+
+    with _WBI_LOCK:
+        # 等待锁的过程中可能已有其他线程获取到了密钥
+        keys = _cached_wbi_keys()
+        if keys:
+            return keys
+
+        max_retries = config.get("retry_max", 10)
+        retry_interval = config.get("retry_interval", 5)
+
+        for attempt in range(max_retries):
+            try:
+                return store_wbi_keys(_cached_nav(session))
+            # 接口返回错误时 data 可能为 null，取 wbi_img 会抛出 TypeError
+            except (requests.RequestException, KeyError, TypeError, ValueError) as e:
+                logger.info("获取WBI密钥失败 (尝试 %d/%d): %s", attempt + 1, max_retries, e)
+                if attempt < max_retries - 1:
+                    logger.info("将在 %s 秒后重试...", retry_interval)
+                    time.sleep(retry_interval)
 
-            else:
-                logger.info("已达到最大重试次数，获取WBI密钥失败。")
-    return None, None
+                else:
+                    logger.info("已达到最大重试次数，获取WBI密钥失败。")
+        return None, None
 
 def get_authenticated_session():
     """获取一个经过认证的session，优先从本地文件加载，否则扫码登录"""
-    session = requests.Session()
     # 为整个会话设置一个统一的 User-Agent
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
-    }
-    session.headers.update(headers)
+    session = new_session(_BASE_HEADERS)
 
-    COOKIE_FILE = DATA_DIR / "bili_cookies.json"
     if COOKIE_FILE.exists():
         try:
-            with open(COOKIE_FILE, 'r') as f:
-                cookies = json.load(f)
+            with open(COOKIE_FILE, 'rb') as f:
+                cookies = _loads(f.read())
             session.cookies.update(cookies)
             
-            nav_api = "https://api.bilibili.com/x/web-interface/nav"
-            response = session.get(nav_api) # 此处将自动使用 session 的 headers
-            if response.json().get('data', {}).get('isLogin'):
+            nav_data = _cached_nav(session)
+            if nav_data.get('data', {}).get('isLogin'):
                 logger.info("已使用本地保存的登录信息。")
                 return session
             else:
@@ -169,35 +361,46 @@ def get_authenticated_session():
 
 def sign_params(params: dict, img_key: str, sub_key: str):
     """为请求参数进行WBI签名"""
-    mixin_key = get_mixin_key(img_key + sub_key)
     curr_time = int(time.time())
     params['wts'] = curr_time
     
-    # 参数按key排序
-    params = dict(sorted(params.items()))
-    
-    # 过滤value中的特殊字符并URL编码
-    params_filtered = {
-        k: ''.join(filter(lambda ch: ch not in "!'()*", str(v)))
-        for k, v in params.items()
-    }
-    query = urllib.parse.urlencode(params_filtered)
+    # 参数按key排序，过滤value中的特殊字符后直接URL编码
+    query = urllib.parse.urlencode([
+        (k, str(v).translate(_WBI_STRIP_TABLE)) for k, v in sorted(params.items())
+    ])
     
     # 计算签名
-    w_rid = hashlib.md5((query + mixin_key).encode()).hexdigest()
+    # WBI签名并非安全用途，usedforsecurity=False 可绕过部分系统上 FIPS 模式的检查
+    h = md5(usedforsecurity=False)
+    h.update(query.encode('ascii'))
+    h.update(_mixin_key_bytes(img_key, sub_key))
+    w_rid = h.hexdigest()
     params['w_rid'] = w_rid
     return params
 
+def _get_session_cache(name: str, session: requests.Session):
+    """读取按session缓存的结果，不存在或已过期时返回None"""
+    entry = _SESSION_INFO_CACHE.get(session, {}).get(name)
+    if entry and time.time() - entry[0] < SESSION_INFO_TTL:
+        return entry[1]
+    return None
+
+def _set_session_cache(name: str, session: requests.Session, value):
+    _SESSION_INFO_CACHE.setdefault(session, {})[name] = (time.time(), value)
+
 def get_my_info(session: requests.Session):
-    """获取当前登录用户的UID和昵称"""
-    url = "https://api.bilibili.com/x/web-interface/nav"
+    """获取当前登录用户的UID和昵称，成功的结果会缓存 SESSION_INFO_TTL 秒"""
+    cached = _get_session_cache("my_info", session)
+    if cached:
+        return cached
+
     try:
-        response = session.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data = _cached_nav(session)
         if data['code'] == 0:
             user_data = data['data']
-            return user_data['mid'], user_data['uname']
+            my_info = (user_data['mid'], user_data['uname'])
+            _set_session_cache("my_info", session, my_info)
+            return my_info
         else:
             logger.info(f"获取用户信息失败: {data['message']}")
             return None, None
@@ -206,15 +409,20 @@ def get_my_info(session: requests.Session):
         return None, None
 
 def get_following_groups(session: requests.Session):
-    """获取关注分组列表，返回一个字典 {group_name: tag_id}"""
-    url = "https://api.bilibili.com/x/relation/tags"
+    """获取关注分组列表，返回一个字典 {group_name: tag_id}，成功的结果会缓存 SESSION_INFO_TTL 秒"""
+    cached = _get_session_cache("following_groups", session)
+    if cached:
+        return cached
+
     try:
-        response = session.get(url)
+        api_limiter.acquire()
+        response = session.get(RELATION_TAGS_API, timeout=10)
         response.raise_for_status()
-        data = response.json()
+        data = _loads(response.content)
         if data['code'] == 0:
             # 包含默认的“全部关注”和“悄悄关注”等
             groups = {group['name']: group['tagid'] for group in data['data']}
+            _set_session_cache("following_groups", session, groups)
             return groups
         else:
             logger.info(f"获取关注分组失败: {data['message']}")
@@ -227,7 +435,6 @@ def get_followings_in_group(session: requests.Session, mid: int, tag_id: int):
     """根据分组ID获取关注的UP主列表，失败时会自动重试。"""
     # 此API (x/relation/tag) 不需要WBI签名
     # 旧的API (x/relation/followings) 会返回全部关注，tagid参数无效
-    api_url = "https://api.bilibili.com/x/relation/tag"
     params = {
         "mid": mid,
         "tagid": tag_id,
@@ -244,27 +451,44 @@ def get_followings_in_group(session: requests.Session, mid: int, tag_id: int):
     for attempt in range(max_retries):
         try:
             # session中已包含User-Agent
-            response = session.get(api_url, params=params, headers=headers, timeout=10)
+            api_limiter.acquire()
+            response = session.get(RELATION_TAG_API, params=params, headers=headers, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = _loads(response.content)
             if data.get('code') == 0:
                 # 成功获取，返回数据
                 return data.get("data", [])
             else:
                 # API返回错误码，打印信息并重试
-                logger.info(f"获取分组关注列表失败 (尝试 {attempt + 1}/{max_retries}): {data.get('message')}")
-        except Exception as e:
+                logger.info("获取分组关注列表失败 (尝试 %d/%d): %s", attempt + 1, max_retries, data.get('message'))
+        except (requests.RequestException, KeyError, ValueError) as e:
             # 请求或解析过程发生异常，打印信息并重试
-            logger.info(f"请求关注列表时发生错误 (尝试 {attempt + 1}/{max_retries}): {e}")
+            logger.info("请求关注列表时发生错误 (尝试 %d/%d): %s", attempt + 1, max_retries, e)
             
         if attempt < max_retries - 1:
-            logger.info(f"将在 {retry_interval} 秒后重试...")
+            logger.info("将在 %s 秒后重试...", retry_interval)
             time.sleep(retry_interval)
         else:
             logger.info("已达到最大重试次数，获取关注列表失败。")
             
     return [] # 所有重试都失败后，返回空列表
 
+def parse_duration(length):
+    """将视频列表中 "分:秒" 或 "时:分:秒" 格式的时长转换为秒数，无法解析时返回None"""
+    try:
+        seconds = 0
+        for part in length.split(":"):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except (AttributeError, ValueError):
+        return None
+
+# 表示请求过于频繁、被风控拦截的HTTP状态码和B站接口错误码
+THROTTLED_HTTP_STATUS = (412, 429)
+THROTTLED_API_CODES = (-412, -799)
+# 表示WBI签名校验失败 (密钥可能已轮换) 的接口错误码
+WBI_REJECTED_API_CODES = (-352, -403)
+
 def get_up_videos(mid, session: requests.Session):
     """获取UP主第一页视频信息"""
     # 获取签名密钥
@@ -285,26 +509,36 @@ def get_up_videos(mid, session: requests.Session):
     # 生成签名
     signed_params = sign_params(params, img_key, sub_key)
     
-    # 请求头
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-        "Referer": f"https://space.bilibili.com/{mid}/"
-    }
+    # 请求头 (User-Agent 等已在 session 中设置)
+    headers = {"Referer": f"https://space.bilibili.com/{mid}/"}
     
     try:
         # 发送API请求
+        api_limiter.acquire()
         response = session.get(
-            "https://api.bilibili.com/x/space/wbi/arc/search",
+            ARC_SEARCH_API,
             params=signed_params,
             headers=headers,
             timeout=10
         )
-        data = response.json()
+        if response.status_code in THROTTLED_HTTP_STATUS:
+            api_limiter.backoff()
+            logger.info("请求被限流 (HTTP %d)，已降低请求频率，本次运行跳过UP主 %s。", response.status_code, mid)
+            return []
+        data = _loads(response.content)
         
         # 检查响应状态
         if data["code"] != 0:
-            logger.info(f"API请求失败: {data['message']}")
+            if data["code"] in THROTTLED_API_CODES:
+                api_limiter.backoff()
+                logger.info("请求被限流 (%s)，已降低请求频率，本次运行跳过UP主 %s。", data['message'], mid)
+            elif data["code"] in WBI_REJECTED_API_CODES:
+                invalidate_wbi_keys((img_key, sub_key))
+                logger.info("WBI签名被拒绝 (%s)，已丢弃缓存的密钥，之后的请求将重新获取。", data['message'])
+            else:
+                logger.info("API请求失败: %s", data['message'])
             return []
+        api_limiter.recover()
         
         # 提取视频数据
         videos = []
@@ -312,18 +546,35 @@ def get_up_videos(mid, session: requests.Session):
             title = video["title"]
             bvid = video["bvid"]
             link = f"https://www.bilibili.com/video/{bvid}"
-            videos.append({"title": title, "link": link, "bvid": bvid})
+            videos.append({
+                "title": title,
+                "link": link,
+                "bvid": bvid,
+                "duration": parse_duration(video.get("length")),
+                "pubdate": video.get("created"),
+            })
         
         return videos
     
     except Exception as e:
-        logger.info(f"请求发生错误: {e}")
+        logger.info("请求发生错误: %s", e)
         return []
 
-def setup_database():
-    """初始化数据库和表"""
-    conn = sqlite3.connect(DB_FILE)
+def connect_database():
+    """打开数据库连接 (自动提交模式) 并应用按连接生效的 PRAGMA 设置"""
+    conn = sqlite3.connect(DB_STR, isolation_level=None)
+    # WAL 模式下 synchronous=NORMAL 是安全的，每次提交无需再额外 fsync
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")    # 64MB 页缓存
+    conn.execute("PRAGMA mmap_size=268435456")  # 256MB 内存映射，加快查询已有视频
+    return conn
+
+def setup_database(conn: sqlite3.Connection):
+    """在给定的连接上初始化数据库和表"""
     cursor = conn.cursor()
+    # WAL 模式写入数据库文件后持久生效，之后的连接无需再设置
+    cursor.execute("PRAGMA journal_mode=WAL")
     # 创建视频表，使用bvid作为主键防止重复
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS videos (
@@ -332,31 +583,49 @@ def setup_database():
             up_mid INTEGER NOT NULL,
             title TEXT NOT NULL,
             link TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            duration INTEGER,
+            pubdate INTEGER
         )
     ''')
-    conn.commit()
-    conn.close()
-
-def save_video_if_not_exists(conn: sqlite3.Connection, video_info: dict):
-    """如果视频不存在，则保存到数据库并返回True，否则返回False。"""
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO videos (bvid, up_name, up_mid, title, link)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            video_info['bvid'],
-            video_info['up_name'],
-            video_info['up_mid'],
-            video_info['title'],
-            video_info['link']
-        ))
-        conn.commit()
-        return True  # 插入成功
-    except sqlite3.IntegrityError:
-        # bvid (主键) 已存在，忽略错误
-        return False # 未插入
+    # 旧版本创建的表没有时长和发布时间字段，按需补上
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(videos)")}
+    for column in ("duration", "pubdate"):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE videos ADD COLUMN {column} INTEGER")
+
+# 所有插入都复用同一条SQL文本，sqlite3 的语句缓存会直接命中已编译好的语句
+INSERT_VIDEO_SQL = (
+    "INSERT OR IGNORE INTO videos (bvid, up_name, up_mid, title, link, duration, pubdate) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+def filter_new_videos(cursor: sqlite3.Cursor, videos: list):
+    """用一次主键查询找出数据库中尚不存在的视频，返回这些新视频组成的列表。"""
+    if not videos:
+        return []
+    placeholders = ",".join("?" * len(videos))
+    cursor.execute(
+        f"SELECT bvid FROM videos WHERE bvid IN ({placeholders})",
+        [video['bvid'] for video in videos]
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    return [video for video in videos if video['bvid'] not in existing]
+
+def save_videos_batch(cursor: sqlite3.Cursor, videos: list):
+    """批量保存视频到数据库，已存在的bvid会被忽略。事务由调用方负责。"""
+    cursor.executemany(INSERT_VIDEO_SQL, [
+        (
+            video['bvid'],
+            video['up_name'],
+            video['up_mid'],
+            video['title'],
+            video['link'],
+            video['duration'],
+            video['pubdate']
+        )
+        for video in videos
+    ])
 
 if __name__ == "__main__":
     # 确保 data 目录存在
@@ -392,8 +661,6 @@ if __name__ == "__main__":
         logger.info("登录失败，程序退出。")
         exit()
 
-    setup_database()
-
     my_mid, my_name = get_my_info(session)
     if not my_mid:
         logger.info("无法获取您的用户ID，程序退出。")
@@ -402,50 +669,98 @@ if __name__ == "__main__":
 
     logger.info("\n正在获取您的关注分组...")
     groups = get_following_groups(session)
-    time.sleep(config.get("retry_interval", 5))
+
+    # 多线程并发获取视频列表，请求之间的间隔由所有线程共享的 api_limiter 控制
+    # 整体吞吐量只取决于 retry_interval：线程数够用完突发令牌、再多一个线程在等待下一个令牌即可，更多线程只会阻塞在 acquire() 上
+    max_workers = api_limiter.capacity + 1
+
+    # 先收集所有目标分组中的UP主，同一UP主出现在多个分组中时只检查一次
+    ups_to_check = {}
+    for group_name in target_group_names:
+        if group_name in groups:
+            tag_id = groups[group_name]
+            logger.info(f"\n--- 正在获取分组: '{group_name}' (tag_id: {tag_id}) ---")
+
+            ups_in_group = get_followings_in_group(session, my_mid, tag_id)
+
+            if ups_in_group:
+                logger.info(f"分组 '{group_name}' 中共有 {len(ups_in_group)} 位UP主。")
+                for up in ups_in_group:
+                    ups_to_check.setdefault(up['mid'], up)
+            else:
+                logger.info(f"分组 '{group_name}' 下没有关注的UP主或获取失败。")
+        else:
+            logger.warning(f"在您的B站关注中未找到名为 '{group_name}' 的分组，已跳过。")
 
     all_new_videos = []
-    conn = sqlite3.connect(DB_FILE)
+    # 整个运行过程只使用这一个数据库连接，结束时在 finally 中关闭
+    # 连接时就会执行 PRAGMA，数据库文件损坏或被锁定时在这里就会出错，因此也放在 try 中
+    conn = None
     try:
-        for group_name in target_group_names:
-            if group_name in groups:
-                tag_id = groups[group_name]
-                logger.info(f"\n--- 正在检查分组: '{group_name}' (tag_id: {tag_id}) ---")
-                
-                ups_in_group = get_followings_in_group(session, my_mid, tag_id)
-                
-                if ups_in_group:
-                    total_ups = len(ups_in_group)
-                    logger.info(f"分组 '{group_name}' 中共有 {total_ups} 位UP主，开始检查...")
-                    for i, up in enumerate(ups_in_group, 1):
-                        logger.info(f"  - [{i}/{total_ups}] 正在检查UP主: {up['uname']:<20} MID: {up['mid']}")
-                        mid = str(up['mid'])
-                        
-                        videos = get_up_videos(mid, session)
-                        if videos:
-                            logger.info(f"    获取到 {len(videos)} 个最新视频，正在比对数据库...")
-                            for video in videos:
-                                video_info = {
-                                    "up_name": up['uname'],
-                                    "up_mid": up['mid'],
-                                    "bvid": video['bvid'],
-                                    "title": video['title'],
-                                    "link": video['link']
-                                }
-                                if save_video_if_not_exists(conn, video_info):
-                                    logger.info(f"      [新视频] {video['title']}")
-                                    logger.info(f"        链接: {video['link']}")
-                                    all_new_videos.append(video_info)
-                        else:
-                            logger.info("    未能获取到视频列表。")
-                        logger.info("")  # 空行分隔不同的UP主
-                        time.sleep(config.get("retry_interval", 5)) # 每次检查UP后稍作停顿，避免过于频繁
-                else:
-                    logger.info(f"分组 '{group_name}' 下没有关注的UP主或获取失败。")
-            else:
-                logger.warning(f"在您的B站关注中未找到名为 '{group_name}' 的分组，已跳过。")
+        conn = connect_database()
+        setup_database(conn)
+        cursor = conn.cursor()  # 整个运行过程复用同一个游标
+        # 连接处于自动提交模式，这里显式开启事务，整个检查过程结束时统一提交，出错时回滚
+        with conn:
+            conn.execute("BEGIN")
+            total_ups = len(ups_to_check)
+            if total_ups:
+                logger.info(f"\n共需检查 {total_ups} 位UP主，开始检查...")
+            # 循环中频繁调用的方法先绑定到变量，省去每次迭代的属性查找
+            log_info = logger.info
+            add_new_video = all_new_videos.append
+            # 所有分组的UP主放进同一个线程池，避免每个分组结束时等待线程池排空
+            # 出错或按下 Ctrl+C 时取消尚未开始的请求并立即返回，不必等所有UP主都请求完才回滚
+            pool = ThreadPoolExecutor(max_workers=max_workers)
+            try:
+                futures = {pool.submit(get_up_videos, str(up['mid']), session): up for up in ups_to_check.values()}
+                # 网络请求在线程池中并发进行，数据库写入留在主线程 (sqlite3 连接不能跨线程使用)
+                for i, future in enumerate(as_completed(futures), 1):
+                    up = futures[future]
+                    log_info("  - [%d/%d] 已检查UP主: %-20s MID: %s", i, total_ups, up['uname'], up['mid'])
+
+                    try:
+                        videos = future.result()
+                    except Exception as e:
+                        # 单个UP主出错时记录并跳过，不影响其余UP主的检查
+                        log_info("    获取视频列表时发生错误，已跳过: %s", e)
+                        videos = []
+                    if videos:
+                        log_info("    获取到 %d 个最新视频，正在比对数据库...", len(videos))
+                        # 稳定运行时绝大多数视频都已入库，先筛出新视频，只插入增量
+                        new_videos = filter_new_videos(cursor, videos)
+                        video_infos = [
+                            {
+                                "up_name": up['uname'],
+                                "up_mid": up['mid'],
+                                "bvid": video['bvid'],
+                                "title": video['title'],
+                                "link": video['link'],
+                                "duration": video['duration'],
+                                "pubdate": video['pubdate']
+                            }
+                            for video in new_videos
+                        ]
+                        if video_infos:
+                            save_videos_batch(cursor, video_infos)
+                        for video_info in video_infos:
+                            log_info("      [新视频] %s", video_info['title'])
+                            log_info("        链接: %s", video_info['link'])
+                            add_new_video(video_info)
+                    else:
+                        log_info("    未能获取到视频列表。")
+                    log_info("")  # 空行分隔不同的UP主
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            pool.shutdown()
+    except sqlite3.Error as e:
+        logger.error(f"操作数据库 {DB_FILE} 失败，本次检查的结果未保存: {e}")
+        # 以非零状态码退出，调用方 (如 schd.ps1) 才能知道本次检查失败
+        exit(1)
     finally:
-        conn.close()
+        if conn is not None:
+            conn.close()
 
     # 汇总并写入文件
     logger.info("-------------------------------------\n")
@@ -458,10 +773,13 @@ if __name__ == "__main__":
         output_filename = DATA_DIR / "list" / f"new_videos_{current_time}.txt"
         output_filename.parent.mkdir(parents=True, exist_ok=True)
 
+        # 先拼接好全部内容，一次性写入文件
+        content = ''.join(
+            f"- {video['title']} | 作者: {video['up_name']} | 链接: {video['link']}\n"
+            for video in all_new_videos
+        )
         with open(output_filename, 'w', encoding='utf-8') as f:
-            for video in all_new_videos:
-                line = f"- {video['title']} | 作者: {video['up_name']} | 链接: {video['link']}\n"
-                f.write(line)
+            f.write(content)
         
         logger.info(f"检查完成，共发现 {new_videos_count} 个新视频。")
         logger.info(f"新视频列表已保存到 {output_filename}")